@@ -1,19 +1,21 @@
 # !/usr/bin/env python
 import urllib.parse
-import re
 import xray2json
-import json
+import orjson
 import os
-import uuid
+import tempfile
 import random
 import subprocess
 import signal
+import socket
 import requests
 import time
 import logging
+import logging.handlers
+import atexit
 import threading
-import copy
-import datetime
+import concurrent.futures
+import queue
 import sys
 import argparse
 
@@ -21,8 +23,20 @@ import argparse
 if not os.path.exists('tmp'):
     os.makedirs('tmp')
 
-# Global variable
-ports = random.sample(range(1024, 65536), 100)
+# Prefer tmpfs for XRay configuration files so writing them never touches the disk
+TMP_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else 'tmp'
+
+# Maximum number of XRay probes running at the same time
+MAX_THREADS = 10
+
+# Number of URLs probed through a single XRay process
+BATCH_SIZE = 8
+
+# Serializes taking a whole batch of ports, so callers sharing a pool never each hold part of it and wait on each other
+ports_lock = threading.Lock()
+
+# Per-thread requests session so each worker reuses one adapter instead of building a new session per probe
+local = threading.local()
 
 # Configuring logging module with a specific format and log level.
 PREFIX = '\033['
@@ -38,25 +52,32 @@ MAPPING = {
 
 # Log formatter
 class LogFormatter(logging.Formatter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Precompute the colored level names and the time color wrapper once instead of per record.
+        self._level_colored = {name: '{0}{1}m{2}{3}'.format(PREFIX, seq, name, SUFFIX) for name, seq in MAPPING.items()}
+        self._time_prefix = '{0}{1}m'.format(PREFIX, MAPPING.get('TIME', 37))
+        self._time_suffix = SUFFIX
     def format(self, record):
         # Customize the log record's formatting by adding ANSI color codes for log level.
-        colored_record = copy.copy(record)
-        levelname = colored_record.levelname
-        seq = MAPPING.get(levelname, 37)
-        colored_record.levelname = ('{0}{1}m{2}{3}'.format(PREFIX, seq, levelname, SUFFIX))
-        return logging.Formatter.format(self, colored_record)
+        levelname = record.levelname
+        colored = self._level_colored.get(levelname)
+        if colored is None:
+            colored = '{0}{1}m{2}{3}'.format(PREFIX, 37, levelname, SUFFIX)
+        # Swap the level name in place for the duration of the call rather than copying the record.
+        record.levelname = colored
+        try:
+            return logging.Formatter.format(self, record)
+        finally:
+            record.levelname = levelname
     def formatTime(self, record, datefmt=None):
         # Customize the time format.
-        seq = MAPPING.get('TIME', 37)
-        converter = datetime.datetime.fromtimestamp(record.created)
+        converter = time.localtime(record.created)
         if datefmt:
-            t = converter.strftime(datefmt)
-            s = '{0}{1}m{2}{3}'.format(PREFIX, seq, t, SUFFIX)
+            t = time.strftime(datefmt, converter)
         else:
-            t = converter.strftime('%Y-%m-%d %H:%M:%S')
-            f = '%s,%03d' % (t, record.msecs)
-            s = '{0}{1}m{2}{3}'.format(PREFIX, seq, f, SUFFIX)
-        return s
+            t = '%s,%03d' % (time.strftime('%Y-%m-%d %H:%M:%S', converter), record.msecs)
+        return self._time_prefix + t + self._time_suffix
 
 # Create a console handler for displaying log on the console.
 ch = logging.StreamHandler()
@@ -65,8 +86,73 @@ logger = logging.getLogger(__name__)
 # Create a custom formatter with desired time format.
 formatter = LogFormatter('[%(asctime)s] [%(levelname)s] %(message)s', datefmt='%H:%M:%S')
 ch.setFormatter(formatter)
-logger.addHandler(ch)
+
+# Probes only enqueue records; a background listener thread does the formatting and writing to the console.
+log_queue = queue.Queue(-1)
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
 logger.setLevel(logging.INFO)
+listener = logging.handlers.QueueListener(log_queue, ch)
+listener.start()
+
+# Flush any queued records before the interpreter exits
+atexit.register(listener.stop)
+
+def _unquote(value: str) -> str:
+    # Only pay for percent-decoding when the value actually contains escapes
+    if '%' in value or '+' in value:
+        return urllib.parse.unquote_plus(value)
+    return value
+
+def _parse_config_fast(config: str) -> dict:
+    """
+    Parse a 'proto://uuid@host:port?k=v&...' configuration string using plain string slicing.
+
+    Mirrors the result of 'urlparse' + 'parse_qs' for well-formed share links without
+    paying for the generic URL parser.
+
+    Raises:
+    - ValueError: If the string does not have the expected shape.
+    """
+    scheme_end = config.find('://')
+    if scheme_end <= 0:
+        raise ValueError("Missing scheme.")
+
+    # The netloc ends at the first '/', '?' or '#' after the scheme
+    netloc_start = scheme_end + 3
+    netloc_end = len(config)
+    for delimiter in '/?#':
+        index = config.find(delimiter, netloc_start, netloc_end)
+        if index != -1:
+            netloc_end = index
+    netloc = config[netloc_start:netloc_end]
+
+    at = netloc.rfind('@')
+    colon = netloc.rfind(':')
+    if at == -1 or colon < at:
+        raise ValueError("Missing uuid or port.")
+
+    result = {
+        'proto': config[:scheme_end].lower(),
+        'uuid': netloc[:at],
+        'address': netloc[at + 1:colon],
+        'port': int(netloc[colon + 1:]),
+    }
+
+    # The query runs from the first '?' after the netloc up to the fragment
+    fragment = config.find('#', netloc_end)
+    if fragment == -1:
+        fragment = len(config)
+    query = config.find('?', netloc_end, fragment)
+    if query != -1:
+        qs = {}
+        for field in config[query + 1:fragment].split('&'):
+            key, _, value = field.partition('=')
+            # Like 'parse_qs', skip blank values and keep the first value of repeated keys
+            if value:
+                qs.setdefault(_unquote(key), _unquote(value))
+        result.update(qs)
+
+    return result
 
 def parse_config(config: str) -> dict:
     """
@@ -83,6 +169,12 @@ def parse_config(config: str) -> dict:
     - ValueError: If the port cannot be converted to an integer.
     """
 
+    try:
+        return _parse_config_fast(config)
+    except ValueError:
+        # Fall back to the generic URL parser for anything unusual
+        pass
+
     result = {}
 
     try:
@@ -113,58 +205,280 @@ def parse_config(config: str) -> dict:
 
     return result
 
-def replace_nth(string: str, __old: str, __new: str, n: int) -> str:
+def join_parts(parts: list, __old: str, __new: str, positions) -> str:
     """
-    Replace the nth occurrence of a substring in a string.
+    Rebuild a string from 'string.split(__old)', using '__new' at the given separator positions.
 
     Parameters:
-    - string (str): The original string.
-    - __old (str): The substring to be replaced.
+    - parts (list): The pieces of the original string split on '__old'.
+    - __old (str): The substring the string was split on.
     - __new (str): The replacement substring.
-    - n (int): The occurrence number to be replaced.
+    - positions (set): 1-based occurrence numbers of '__old' to replace.
+
+    Returns:
+    - str: The updated string.
+    """
+    pieces = [parts[0]]
+    for n in range(1, len(parts)):
+        pieces.append(__new if n in positions else __old)
+        pieces.append(parts[n])
+    return ''.join(pieces)
+
+def wait_for_port(port: int, process: subprocess.Popen = None, timeout: float = 1.5) -> bool:
+    """
+    Wait until something accepts TCP connections on a local port.
+
+    Parameters:
+    - port (int): The local port to poll.
+    - process (subprocess.Popen, optional): Stop waiting early if this process exits.
+    - timeout (float): Maximum number of seconds to wait.
 
     Returns:
-    - str: The updated string after replacing the nth occurrence.
+    - bool: True if the port accepted a connection before the timeout, otherwise False.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.05):
+                return True
+        except OSError:
+            time.sleep(0.01)
+    return False
+
+def terminate_process(process: subprocess.Popen, timeout: float = 2) -> None:
+    """
+    Stop a process started with 'start_new_session=True' and reap it.
+
+    Parameters:
+    - process (subprocess.Popen): The process to stop; it leads its own process group.
+    - timeout (float): Seconds to wait after SIGTERM before sending SIGKILL.
+    """
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.wait()
+
+def get_session() -> requests.Session:
+    """
+    Return the calling thread's requests session, creating it on first use.
+
+    Returns:
+    - requests.Session: A session with a single-connection adapter and no retries.
+    """
+    session = getattr(local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        local.session = session
+    return session
+
+def make_port_pool(size: int) -> queue.Queue:
+    """
+    Create a pool of distinct random local SOCKS ports.
+
+    Parameters:
+    - size (int): Number of ports in the pool.
+
+    Returns:
+    - queue.Queue: The ports; probes take a port and hand it back when done.
+    """
+    pool = queue.Queue()
+    for port in random.sample(range(10000, 65000), size):
+        pool.put(port)
+    return pool
+
+def build_batch_config(urls: list, batch_ports: list):
+    """
+    Build one XRay configuration that serves several URLs at once.
+
+    Each URL gets its own SOCKS inbound on the matching port, routed to its own outbound.
+
+    Parameters:
+    - urls (list): The URLs to convert with 'xray2json.generateConfigDict'.
+    - batch_ports (list): One local port per URL.
+
+    Returns:
+    - tuple: The combined configuration (or None if no URL could be converted)
+             and the list of (url, port) pairs it serves.
 
     Note:
-    - If n is invalid (less than or equal to 0, or greater than the number of occurrences), 
-      the original string is returned without any modifications.
+    - URLs that cannot be converted are logged and left out of the batch.
     """
-    # Find all occurrences of the substring in the string
-    occurrences = [m.start() for m in re.finditer(re.escape(__old), string)]
+    config = None
+    inbounds = []
+    outbounds = []
+    rules = []
+    probes = []
 
-    if n <= 0 or n > len(occurrences):
-        # Invalid n, do nothing
-        return string
+    for i, (url, port) in enumerate(zip(urls, batch_ports)):
+        try:
+            single = xray2json.generateConfigDict(url)
+            if single is None:
+                raise ValueError('unsupported protocol')
+        except Exception as e:
+            logger.warning('Failed to generate XRay config for {} ({})'.format(url, e))
+            continue
+
+        # Give this URL's inbound and outbound unique tags and route one to the other
+        inbound = single['inbounds'][0]
+        inbound['tag'] = 'in_{}'.format(i)
+        inbound['port'] = port
+        outbound = single['outbounds'][0]
+        outbound['tag'] = 'out_{}'.format(i)
+        inbounds.append(inbound)
+        outbounds.append(outbound)
+        rules.append({'type': 'field', 'inboundTag': [inbound['tag']], 'outboundTag': outbound['tag']})
+        probes.append((url, port))
+
+        # The log, DNS, routing and fallback outbounds are the same for every URL; keep the first ones
+        if config is None:
+            config = single
+
+    if config is not None:
+        config.pop('_comment', None)
+        config['inbounds'] = inbounds
+        config['outbounds'] = outbounds + config['outbounds'][1:]
+        config['routing']['rules'] = rules + config['routing'].get('rules', [])
+
+    return config, probes
+
+def run_batch(urls: list, port_pool: queue.Queue) -> list:
+    """
+    Probe URLs through XRay, one XRay process per batch of at most 'BATCH_SIZE' URLs.
 
-    # Find the index of the nth occurrence
-    nth_occurrence_index = occurrences[n-1]
+    Parameters:
+    - urls (list): List of URLs to be processed by XRay.
+    - port_pool (queue.Queue): Pool to take local ports from; it must hold at least 'BATCH_SIZE' ports.
 
-    # Split the string into prefix and suffix at the nth occurrence
-    prefix = string[:nth_occurrence_index]
-    suffix = string[nth_occurrence_index:]
+    Returns:
+    - list: The URLs whose probe succeeded (vulnerable).
 
-    # Replace the substring in the suffix
-    updated_suffix = suffix.replace(__old, __new, 1)
+    Note:
+    - Longer lists are split into batches of 'BATCH_SIZE' and probed one batch after another.
+    - If XRay exits before serving the whole batch, the unprobed URLs are retried one per XRay process.
+    - One XRay process serves the whole batch, with one SOCKS inbound and outbound per URL.
+    - XRay configuration is generated dynamically using the 'xray2json.generateConfigDict' method.
+    - XRay is executed as a subprocess, and a temporary configuration file is created.
+    - A request is made through each URL's proxy port in turn.
+    - The XRay process is terminated, and the temporary configuration file is removed.
+    """
+    if len(urls) > BATCH_SIZE:
+        # Never ask the pool for more ports than one batch needs
+        result = []
+        for i in range(0, len(urls), BATCH_SIZE):
+            result.extend(run_batch(urls[i:i+BATCH_SIZE], port_pool))
+        return result
+
+    # Get one port per URL, waiting for ports to be returned if the pool is empty
+    with ports_lock:
+        batch_ports = [port_pool.get() for _ in urls]
+
+    result = []
+    retry = []
+    filename = None
+    process = None
+
+    try:
+        # Generate one XRay config with an inbound/outbound pair per URL
+        config, probes = build_batch_config(urls, batch_ports)
+        if not probes:
+            return result
+
+        # Serialize the XRay configuration up front so it is written with a single syscall
+        data = orjson.dumps(config)
 
-    # Combine the prefix and the updated suffix
-    return prefix + updated_suffix
+        # Write the XRay configuration to a unique temporary file
+        fd, filename = tempfile.mkstemp(suffix='.json', dir=TMP_DIR)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+        # Run XRay as a subprocess using the generated configuration file.
+        # No shell and no preexec_fn, so CPython can spawn it with vfork instead of a full fork.
+        process = subprocess.Popen(['xray', 'run', '-c', filename], start_new_session=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        for index, (url, port) in enumerate(probes):
+            # Wait for XRay to start listening instead of sleeping a fixed second. A timeout with
+            # XRay still running falls through to the request; an exited XRay cannot serve any probe.
+            if not wait_for_port(port, process) and process.poll() is not None:
+                skipped = [skipped_url for skipped_url, _ in probes[index:]]
+                if len(probes) > 1:
+                    # One bad outbound or an already bound port takes the whole batch down;
+                    # probe the rest on their own so only the culprit goes unprobed.
+                    logger.error('XRay exited with code {}; probing {} URL(s) individually'.format(process.returncode, len(skipped)))
+                    retry = skipped
+                else:
+                    logger.error('XRay exited with code {}; URL not probed: {}'.format(process.returncode, url))
+                break
+
+            try:
+                # Make a request using the configured proxy. The connection is closed afterwards so
+                # a later probe on the same port never reuses a tunnel from a different config.
+                proxy = 'socks5://127.0.0.1:{}'.format(port)
+                get_session().get('https://api.ipify.org', proxies=dict(http=proxy, https=proxy), headers={'Connection': 'close'}, timeout=7)
+
+                # If the request is successful, record the URL
+                result.append(url)
+                logger.info('Vulnerable: {}'.format(url))
+            except Exception as e:
+                logger.warning('Failed to establish connection at port {} (Not vulnerable)'.format(port))
+    finally:
+        # Each cleanup step only runs if its resource was created, so a failure part-way
+        # through setup never leaks an XRay process, a temporary file or a port.
+        if process is not None:
+            terminate_process(process)
+
+        if filename is not None:
+            try:
+                os.unlink(filename)
+            except OSError:
+                pass
+
+        # Return the ports to the pool, even if the probes could not be set up
+        for port in batch_ports:
+            port_pool.put(port)
+
+    # Only retry once the batch's ports are back in the pool
+    for url in retry:
+        result.extend(run_batch([url], port_pool))
+
+    # Return the result
+    return result
 
 class SniChecker:
-    def __init__(self, sni: str, config: str) -> None:
+    def __init__(self, sni: str, config: str, parsed: dict = None, parts: list = None) -> None:
         """
         Initialize the SniChecker instance.
 
         Args:
             sni (str): The Server Name Indication (SNI) to be used for generating URLs.
             config (str): The configuration string containing the base URL and additional settings.
+            parsed (dict, optional): The result of 'parse_config(config)', if already known.
+            parts (list, optional): 'config' split on the address, if already known.
         """
         # Store the provided SNI and URL configuration in instance attributes
         self.sni = sni
         self.url = config
 
         # Parse the configuration string and store the result in self.config
-        self.config = parse_config(config)
+        self.config = parsed if parsed is not None else parse_config(config)
+
+        # Split the URL on the address once so variants can be built by joining the pieces
+        self.parts = parts if parts is not None else config.split(self.config['address'])
 
         # Initialize an empty list to store generated URLs
         self.urls = []
@@ -177,107 +491,94 @@ class SniChecker:
             list: A list of generated URLs.
         """
         address = self.config['address']
-        url = self.url
-        generated_urls = []
+        parts = self.parts
+
+        count = len(parts) - 1
 
-        generated_urls.append(url.replace(address, self.sni, 1))
-        # return generated_urls
+        # Occurrences (1-based) that are replaced on their own
+        singles = [1]
 
         if self.config.get('sni'):
             # Generate URLs with the SNI replaced at different occurrences
-            generated_urls.append(replace_nth(url, address, self.sni, 2))
+            singles.append(2)
 
         if self.config.get('host'):
             # Generate URL with the SNI replaced at the 3rd occurrence
-            generated_urls.append(replace_nth(url, address, self.sni, len(generated_urls)+1))
-        
-        if len(generated_urls) != 1:
-            for i in range(len(generated_urls)):
-                if i == 0:
-                    continue
-                url = generated_urls[i]
-                for j in range(url.count(address)-1):
-                    generated_urls.append(replace_nth(url, address, self.sni, j+1))
-        # return list(set(generated_urls))
+            singles.append(len(singles)+1)
+
+        # Each variant is the set of address occurrences that get replaced by the SNI
+        variants = [(n,) for n in singles]
+        for replaced in singles[1:]:
+            # Combine each extra single replacement with the leading remaining occurrences
+            remaining = [n for n in range(1, count+1) if n != replaced]
+            variants.extend((replaced, n) for n in remaining[:len(remaining)-1])
+
+        # Build each distinct set of valid positions once, so no URL is probed twice
+        seen = set()
+        generated_urls = []
+        for variant in variants:
+            positions = frozenset(n for n in variant if 0 < n <= count)
+            if not positions or positions in seen:
+                continue
+            seen.add(positions)
+            generated_urls.append(join_parts(parts, address, self.sni, positions))
+
         return generated_urls
     
-    def run(self, urls) -> str:
+    def run(self, urls, port_pool: queue.Queue = None) -> list:
         """
         Execute the XRay tool with the provided URLs.
 
         Parameters:
-        - urls (list): List of URLs to be processed by XRay.
+        - urls (list): List of URLs to be processed by XRay. A single URL string is also accepted.
+        - port_pool (queue.Queue, optional): Shared pool to take local ports from, as built by
+          'make_port_pool'. A private pool is used if omitted.
 
         Returns:
-        - result: Returns the input 'urls' if the XRay execution is successful,
-                  otherwise returns False.
+        - list: The URLs whose probe succeeded (vulnerable).
 
         Note:
-        - XRay configuration is generated dynamically using the 'xray2json.generateConfig' method.
-        - XRay is executed as a subprocess, and a temporary configuration file is created.
-        - A request is made using a proxy configured with the generated port.
-        - The XRay process is terminated, and the temporary configuration file is removed.
+        - This is a thin wrapper around 'run_batch'; the probe does not depend on the instance.
         """
+        if isinstance(urls, str):
+            urls = [urls]
 
-        # Get a port from the available ports
-        port = ports.pop()
-
-        # Generate XRay config JSON and replace the port
-        config = json.loads(xray2json.generateConfig(urls).replace('1080', str(port)))
-
-        # Create a unique filename for the XRay configuration
-        filename = 'tmp/{}.json'.format(uuid.uuid4())
+        if port_pool is None:
+            port_pool = make_port_pool(min(len(urls), BATCH_SIZE))
 
-        # Write the XRay configuration to a file
-        file = open(filename, 'w')
-        json.dump(config, file, indent=4)
-        file.close()
+        return run_batch(urls, port_pool)
 
-        # Run XRay as a subprocess using the generated configuration file
-        process = subprocess.Popen('xray run -c "{}"'.format(filename), shell=True, preexec_fn=os.setsid, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-        result = None
-
-        try:
-            # Sleep to allow XRay to start
-            time.sleep(1)
-
-            # Make a request using the configured proxy
-            requests.get('https://api.ipify.org', proxies=dict(http='socks5://127.0.0.1:{}'.format(port), https='socks5://127.0.0.1:{}'.format(port)), timeout=7)
-
-            # If the request is successful, set result to the input 'urls'
-            result = urls
-            logger.info('Vulnerable: {}'.format(urls))
-        except Exception as e:
-            # Log the exception (consider using a logging library instead of print)
-            logger.warning('Failed to establish connection at port {} (Not vulnerable)'.format(port))
 
-            # If an exception occurs, set result to False
-            result = False
-        finally:
-            # Terminate the XRay process and wait for it to finish
-            os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-            process.wait()
+def read_sni(path: str):
+    """
+    Yield SNI values from a file, one stripped line at a time.
 
-            # Close the file and remove the temporary configuration file
-            file.close()
-            os.remove(filename)
+    Parameters:
+    - path (str): Path to the file containing SNI values.
 
-        # Return the result
-        return result
+    Note:
+    - Blank lines are skipped.
+    """
+    with open(path, 'r', encoding='utf-8', buffering=1 << 20) as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                yield line
 
 
-def start(config: str, sni: str = 'bug.txt'):
+def start(config: str, sni: str = 'bug.txt', max_threads: int = MAX_THREADS):
     """
     Start the SniChecker with the provided configuration and SNI file.
 
     Parameters:
     - config (str): XRay config.
     - sni (str): Path to the file containing SNI (Server Name Indication) values.
+    - max_threads (int): Maximum number of XRay probes running at the same time.
 
     Note:
     - The 'SniChecker' class is used to perform SNI checks based on the provided configuration and SNI values.
     - The 'generate' method of 'SniChecker' is called to generate URLs based on the specified SNI values and configuration.
+    - The SNI file is streamed; probes start as soon as the first URLs are generated.
 
     Example:
     ```
@@ -285,36 +586,58 @@ def start(config: str, sni: str = 'bug.txt'):
     ```
     """
 
-    # Read SNI values from the specified file
-    configs = []
-    sni = [x.decode('utf-8').strip() for x in open(sni, 'rb')]
-
-    for x in sni:
-        # Instantiate SniChecker with a specific SNI and URL configuration
-        sni_checker = SniChecker(
-            sni=x,
-            config=config
-        )
-
-        # Generate URLs based on the SNI values and configuration
-        generated_urls = sni_checker.generate()
-        configs.extend(generated_urls)
-    
-    # Creating threading.Semaphore to control the number of concurrent threads
-    max_threads = 10
-    semaphore = threading.Semaphore(value=max_threads)
-    
-    # Start threads
-    threads = []
-    for config in configs:
-        thread = threading.Thread(target=lambda x=config: sni_checker.run(x))
-        threads.append(thread)
-        thread.start()
-    for x in threads:
-        try:
-            x.join()
-        except Exception as e:
-            logger.critical(e)
+    # Parse the configuration and split it on the address once; only the SNI changes per line
+    parsed = parse_config(config)
+    parts = config.split(parsed['address'])
+
+    def collect(futures):
+        # Surface any exception raised by a finished probe
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                logger.critical(e)
+
+    # Enough local ports for every worker to hold a full batch at once
+    port_pool = make_port_pool(max_threads * BATCH_SIZE)
+
+    # Cap the number of queued batches so memory stays bounded no matter how large the SNI file is
+    max_pending = max_threads * 4
+
+    # A bounded pool of worker threads keeps at most 'max_threads' XRay instances running at once
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
+        pending = set()
+        batch = []
+
+        def submit(batch):
+            nonlocal pending
+            if len(pending) >= max_pending:
+                # Wait for a batch to finish before queueing more
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                collect(done)
+            pending.add(executor.submit(run_batch, batch, port_pool))
+
+        for x in read_sni(sni):
+            # Instantiate SniChecker with a specific SNI and URL configuration
+            sni_checker = SniChecker(
+                sni=x,
+                config=config,
+                parsed=parsed,
+                parts=parts
+            )
+
+            # Generate URLs based on the SNI values and configuration and queue them in batches,
+            # so each XRay process serves 'BATCH_SIZE' URLs instead of one
+            for url in sni_checker.generate():
+                batch.append(url)
+                if len(batch) >= BATCH_SIZE:
+                    submit(batch)
+                    batch = []
+
+        if batch:
+            submit(batch)
+
+        collect(concurrent.futures.as_completed(pending))
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="SNI Checker using XRay Core Config")
@@ -1,4 +1,5 @@
 import json
+import orjson
 import base64
 import argparse
 import re
@@ -1122,6 +1123,11 @@ def get_routing():
 
 
 def generateConfig(config: str, dns_list = ["8.8.8.8"]):
+    res = generateConfigDict(config, dns_list = dns_list)
+    return None if res is None else json.dumps(res)
+
+
+def generateConfigDict(config: str, dns_list = ["8.8.8.8"]):
 
     allowInsecure = True
 
@@ -1192,12 +1198,12 @@ def generateConfig(config: str, dns_list = ["8.8.8.8"]):
             routing = get_routing(),
         )
 
-        v2rayConfig_str_json = json.dumps(v2rayConfig, default=vars)
+        v2rayConfig_str_json = orjson.dumps(v2rayConfig, default = vars)
 
-        res = json.loads(v2rayConfig_str_json)
+        res = orjson.loads(v2rayConfig_str_json)
         res = remove_nulls(res)
 
-        return json.dumps(res)
+        return res
 
     elif protocol == EConfigType.VLESS.protocolName:
 
@@ -1263,12 +1269,12 @@ def generateConfig(config: str, dns_list = ["8.8.8.8"]):
             routing = get_routing(),
         )
 
-        v2rayConfig_str_json = json.dumps(v2rayConfig, default = vars)
+        v2rayConfig_str_json = orjson.dumps(v2rayConfig, default = vars)
 
-        res = json.loads(v2rayConfig_str_json)
+        res = orjson.loads(v2rayConfig_str_json)
         res = remove_nulls(res)
 
-        return json.dumps(res)
+        return res
 
     elif protocol == EConfigType.TROJAN.protocolName:
 
@@ -1349,12 +1355,12 @@ def generateConfig(config: str, dns_list = ["8.8.8.8"]):
             routing = get_routing(),
         )
 
-        v2rayConfig_str_json = json.dumps(v2rayConfig, default = vars)
+        v2rayConfig_str_json = orjson.dumps(v2rayConfig, default = vars)
 
-        res = json.loads(v2rayConfig_str_json)
+        res = orjson.loads(v2rayConfig_str_json)
         res = remove_nulls(res)
 
-        return json.dumps(res)
+        return res
     
     elif protocol == EConfigType.SHADOWSOCKS.protocolName:
         outbound = get_outbound_ss()
@@ -1394,9 +1400,9 @@ def generateConfig(config: str, dns_list = ["8.8.8.8"]):
                 routing = get_routing(),
             )
 
-            v2rayConfig_str_json = json.dumps(v2rayConfig, default = vars)
+            v2rayConfig_str_json = orjson.dumps(v2rayConfig, default = vars)
 
-        res = json.loads(v2rayConfig_str_json)
+        res = orjson.loads(v2rayConfig_str_json)
         res = remove_nulls(res)
 
-        return json.dumps(res)
\ No newline at end of file
+        return res
\ No newline at end of file